@@ -2,6 +2,7 @@
 
 import time
 import json
+from prisonersdilemma.game_store import GameStore
 
 
 class PrisonersDilemmaBot:
@@ -13,6 +14,8 @@ class PrisonersDilemmaBot:
         game_matrix=(5, 3, 1, 0),
         moves_to_play=10,
         timeout=2 * 86400,
+        max_resident_games=None,
+        spill_file=None,
     ):
         """Initializes a new Prisoner's Dilemma bot
 
@@ -21,13 +24,17 @@ class PrisonersDilemmaBot:
         :param moves_to_play: number of moves to play with each opponent, defaults to 10
         :param timeout: timeout after which the current game for the opponen will be discarded,
         defaults to 2 days
+        :param max_resident_games: maximum number of active games kept in memory, defaults to no
+        limit
+        :param spill_file: path to the SQLite database where idle games are spilled when the memory
+        limit is reached, defaults to None
         """
         self.strategy = strategy
         self.game_matrix = game_matrix
         self.moves_to_play = moves_to_play
         self.timeout = timeout
 
-        self.active_games = {}
+        self.active_games = GameStore(max_resident_games, spill_file)
 
     def is_user_playing(self, user):
         """Check if a user is currently playing a game
@@ -36,11 +43,20 @@ class PrisonersDilemmaBot:
         """
         return user in self.active_games
 
-    def play(self, user, opponent_move):
+    def is_game_expired(self, game):
+        """Check if the opponent didn't play for longer than the timeout
+
+        :param game: game state
+        """
+        return time.time() - game["last_time"] > self.timeout
+
+    def play(self, user, opponent_move, own_move=None):
         """Play a single move of the Prisoner's Dilemma game with one opponent
 
         :param user: name of the opponent
         :param opponent_move: move of the opponent: True for COOPERATE and False for DEFECT
+        :param own_move: own move if it was already chosen by the strategy for the current moves
+        history, defaults to choosing it now
         :return: The current game state for this opponent - a dict containing the start and last
         played time, the moves history and the current scores
         """
@@ -48,7 +64,7 @@ class PrisonersDilemmaBot:
         game = self.active_games.get(user, None)
 
         # Check if there is no active game for this user or the user didn't play for a long time
-        if not game or time.time() - game["last_time"] > self.timeout:
+        if not game or self.is_game_expired(game):
             self.active_games[user] = dict(
                 start_time=time.time(),
                 last_time=time.time(),
@@ -58,17 +74,10 @@ class PrisonersDilemmaBot:
             )
             return self.active_games[user]
 
-        # Play both moves
-        own_move = self.strategy(game["moves"])
-        game["moves"].append([own_move, opponent_move])
-
-        # Calculate the outcome and update the total points
-        payoffs = self.get_payoffs(own_move, opponent_move)
-        game["last_points"] = payoffs
-        game["total_points"] = [
-            game["total_points"][0] + payoffs[0],
-            game["total_points"][1] + payoffs[1],
-        ]
+        # Play both moves and update the points
+        if own_move is None:
+            own_move = self.strategy(game["moves"])
+        game.update(self.get_next_state(game, own_move, opponent_move))
         game["last_time"] = time.time()
 
         # Check if the game is finished and delete
@@ -77,6 +86,26 @@ class PrisonersDilemmaBot:
 
         return game
 
+    def get_next_state(self, game, own_move, opponent_move):
+        """Compute the moves history and the scores after one more round without changing the game
+
+        :param game: current game state
+        :param own_move: own move encoded as a boolean
+        :param opponent_move: opponent move encoded as a boolean
+        :return: A dict containing the moves history, the last points and the total points after
+        the round
+        """
+        payoffs = self.get_payoffs(own_move, opponent_move)
+
+        return dict(
+            moves=game["moves"] + [[own_move, opponent_move]],
+            last_points=payoffs,
+            total_points=[
+                game["total_points"][0] + payoffs[0],
+                game["total_points"][1] + payoffs[1],
+            ],
+        )
+
     def get_payoffs(self, own_move, opponent_move):
         """Compute the payoffs of a single round
 
@@ -99,12 +128,22 @@ class PrisonersDilemmaBot:
         :param filename: path to the file where the games are saved
         """
         with open(filename, "r") as json_file:
-            self.active_games = json.load(json_file)
+            self.active_games.clear()
+            self.active_games.update(json.load(json_file))
 
     def save_active_games(self, filename):
         """Save the active games to a JSON file
 
         :param filename: path to the file where the games will be saved
         """
+        self.purge_expired_games()
+
         with open(filename, "w") as json_file:
-            json.dump(self.active_games, json_file)
+            json.dump(self.active_games.to_dict(), json_file)
+
+    def purge_expired_games(self):
+        """Delete the games of the opponents that didn't play for longer than the timeout
+
+        :return: number of deleted games
+        """
+        return self.active_games.purge(self.is_game_expired)
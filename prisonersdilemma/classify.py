@@ -0,0 +1,257 @@
+"""Module implementing a batched classification of the opponents' strategies in archived games"""
+
+import json
+import itertools
+import numpy as np
+import prisonersdilemma.strategy as strategy
+
+
+CLASSIC_STRATEGIES = dict(
+    always_cooperate=strategy.play_always_cooperate,
+    always_defect=strategy.play_always_defect,
+    tit_for_tat=strategy.play_tit_for_tat,
+    grudger=strategy.play_grudger,
+)
+
+# Games are encoded as integers with 2 bits per round and 5 bits for the round number
+MAX_MOVES = 30
+
+
+def games_to_arrays(games):
+    """Convert archived games to padded arrays of moves
+
+    :param games: list of archived games
+    :raises ValueError: raises an exception if a game is longer than MAX_MOVES
+    :return: pair containing a boolean array of shape (games, rounds, 2) with the bot and the
+    opponent moves and an array with the number of rounds of each game
+    """
+    lengths = np.array([len(game["moves"]) for game in games], dtype=np.int64)
+    max_length = int(lengths.max()) if len(games) > 0 else 0
+
+    if max_length > MAX_MOVES:
+        raise ValueError("Games longer than %d moves are not supported" % MAX_MOVES)
+
+    # Scatter the moves of all games into the padded array at once
+    played = np.arange(max_length) < lengths[:, None]
+    moves = np.zeros((len(games), max_length, 2), dtype=bool)
+    moves[played] = np.array(
+        list(itertools.chain.from_iterable(game["moves"] for game in games)),
+        dtype=bool,
+    ).reshape(-1, 2)
+
+    return moves, lengths
+
+
+def decode_history(key):
+    """Decode a history key to a list of moves from the opponent's point of view
+
+    :param key: history key encoding the round number and the moves played before it
+    :return: list of the moves history as expected by the strategy functions
+    """
+    rounds, code = key % 32, key // 32
+    return [
+        [bool(code >> (2 * index + 1) & 1), bool(code >> (2 * index) & 1)]
+        for index in range(rounds)
+    ]
+
+
+class StrategyClassifier:
+    """Classifier finding the strategy that explains best the moves of each opponent
+
+    The moves of all games in a batch are compared to the strategies at once and the matching
+    moves are added up per opponent over all batches. The strategy functions are called only
+    once for every distinct history in a batch and their answers are remembered across batches,
+    up to a maximum number of histories.
+    """
+
+    def __init__(self, strategies=None, max_predictions=1000000):
+        """Initializes a new strategy classifier
+
+        :param strategies: dict mapping names to strategy functions, defaults to the classic
+        strategies. Ties are resolved in the order of the strategies.
+        :param max_predictions: maximum number of histories whose predictions are remembered,
+        defaults to 1000000
+        """
+        self.strategies = strategies or CLASSIC_STRATEGIES
+        self.max_predictions = max_predictions
+        self.predictions = {}
+
+        # Totals of the opponents, the arrays grow as new opponents are added
+        self.players = {}
+        self.matches = np.zeros((0, len(self.strategies)), dtype=np.int64)
+        self.rounds = np.zeros(0, dtype=np.int64)
+        self.games = np.zeros(0, dtype=np.int64)
+
+    def predict(self, keys):
+        """Predict the moves of all strategies for many histories
+
+        :param keys: array of history keys
+        :return: boolean array of shape (histories, strategies) with the predicted moves
+        """
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        unique_keys = unique_keys.tolist()
+
+        # Call the strategies only for the histories that weren't seen before
+        new_predictions = {}
+        for key in unique_keys:
+            if key not in self.predictions:
+                history = decode_history(key)
+                new_predictions[key] = [
+                    bool(strategy_function(history))
+                    for strategy_function in self.strategies.values()
+                ]
+
+        unique_moves = np.array(
+            [
+                (
+                    self.predictions[key]
+                    if key in self.predictions
+                    else new_predictions[key]
+                )
+                for key in unique_keys
+            ],
+            dtype=bool,
+        ).reshape(-1, len(self.strategies))
+
+        # Remember the new predictions without growing beyond the limit
+        if len(self.predictions) + len(new_predictions) > self.max_predictions:
+            self.predictions.clear()
+        self.predictions.update(
+            itertools.islice(new_predictions.items(), self.max_predictions)
+        )
+
+        return unique_moves[inverse.reshape(-1)]
+
+    def count_matches(self, moves, lengths):
+        """Count the moves of the opponents matching each strategy
+
+        :param moves: boolean array of shape (games, rounds, 2) with the bot and opponent moves
+        :param lengths: array with the number of rounds of each game
+        :return: array of shape (games, strategies) with the number of matching moves
+        """
+        games, rounds = moves.shape[:2]
+        bot_moves = moves[:, :, 0]
+        opponent_moves = moves[:, :, 1]
+
+        # Encode the history before each round from the opponent's point of view
+        symbols = opponent_moves.astype(np.int64) * 2 + bot_moves
+        weights = np.left_shift(1, 2 * np.arange(rounds, dtype=np.int64))
+        codes = np.zeros((games, rounds), dtype=np.int64)
+        codes[:, 1:] = np.cumsum(symbols[:, :-1] * weights[:-1], axis=1)
+        keys = codes * 32 + np.arange(rounds, dtype=np.int64)
+
+        # Compare the predictions of all strategies to the played moves at once
+        played = np.arange(rounds) < lengths[:, None]
+        matches = np.zeros((games, rounds, len(self.strategies)), dtype=bool)
+        matches[played] = self.predict(keys[played]) == opponent_moves[played][:, None]
+
+        return matches.sum(axis=1)
+
+    def add_games(self, games):
+        """Add the matching moves of a batch of archived games to the totals of their opponents
+
+        :param games: list of archived games
+        """
+        if len(games) == 0:
+            return
+
+        moves, lengths = games_to_arrays(games)
+        matches = self.count_matches(moves, lengths)
+
+        # Find the index of each opponent, adding the new ones in the order of their first game
+        users = np.array([game.get("user", "") for game in games])
+        unique_users, first_games, inverse = np.unique(
+            users, return_index=True, return_inverse=True
+        )
+        for user in unique_users[np.argsort(first_games)].tolist():
+            if user not in self.players:
+                self.players[user] = len(self.players)
+
+        indices = np.array([self.players[user] for user in unique_users.tolist()])
+        indices = indices[inverse.reshape(-1)]
+        self.grow(len(self.players))
+
+        # Add up the totals of all games of each opponent at once
+        np.add.at(self.matches, indices, matches)
+        np.add.at(self.rounds, indices, lengths)
+        np.add.at(self.games, indices, 1)
+
+    def grow(self, players):
+        """Grow the arrays with the totals of the opponents to fit a number of opponents
+
+        :param players: number of opponents
+        """
+        capacity = len(self.rounds)
+        if players <= capacity:
+            return
+
+        # Double the capacity to add the new opponents in amortized constant time
+        capacity = max(players, 2 * capacity)
+        extra = capacity - len(self.rounds)
+        self.matches = np.concatenate(
+            [self.matches, np.zeros((extra, len(self.strategies)), dtype=np.int64)]
+        )
+        self.rounds = np.concatenate([self.rounds, np.zeros(extra, dtype=np.int64)])
+        self.games = np.concatenate([self.games, np.zeros(extra, dtype=np.int64)])
+
+    def classify(self):
+        """Classify all opponents of the added games
+
+        :return: list of dicts containing the user, the number of games, the most similar
+        strategy and the fraction of the user's moves matching it
+        """
+        names = list(self.strategies)
+        users = list(self.players)
+
+        if len(users) == 0:
+            return []
+
+        count = len(users)
+        scores = self.matches[:count] / np.maximum(self.rounds[:count], 1)[:, None]
+
+        return [
+            dict(user=user, games=games, strategy=names[index], score=score)
+            for user, games, index, score in zip(
+                users,
+                self.games[:count].tolist(),
+                scores.argmax(axis=1).tolist(),
+                scores.max(axis=1).tolist(),
+            )
+        ]
+
+
+def read_archive_chunks(filename, chunk_size):
+    """Read the archived games in chunks
+
+    :param filename: path to the archive file
+    :param chunk_size: maximum number of games in a chunk
+    :return: generator of lists of archived games
+    """
+    with open(filename) as archive:
+        chunk = []
+        for line in archive:
+            if line.strip():
+                chunk.append(json.loads(line))
+
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+
+def classify_archive(filename, classifier=None, chunk_size=10000):
+    """Classify the opponents of all archived games keeping at most one chunk of games in memory
+
+    :param filename: path to the archive file
+    :param classifier: StrategyClassifier to use, defaults to the classic strategies
+    :param chunk_size: number of games processed at once, defaults to 10000
+    :return: list of classification results for each opponent
+    """
+    classifier = classifier or StrategyClassifier()
+
+    for chunk in read_archive_chunks(filename, chunk_size):
+        classifier.add_games(chunk)
+
+    return classifier.classify()
@@ -0,0 +1,199 @@
+"""Module implementing a tiered storage for the active Prisoner's Dilemma games"""
+
+import json
+import sqlite3
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+
+class GameStore(MutableMapping):
+    """Dictionary-like storage of the active games with an LRU-bounded in-memory hot set
+
+    The most recently used games are kept in memory. When the number of resident games exceeds
+    the configured limit, the least recently used games are spilled to an SQLite database on the
+    disk and loaded back transparently the next time they are accessed. Only the games that were
+    accessed since they were last written are written to the disk again.
+    """
+
+    def __init__(self, max_resident=None, spill_file=None):
+        """Initializes a new game store
+
+        :param max_resident: maximum number of games kept in memory, defaults to no limit
+        :param spill_file: path to the SQLite database where idle games are spilled, required if
+        max_resident is set
+        :raises ValueError: raises an exception if the memory is limited, but no spill file is
+        given or the limit is lower than 1
+        """
+        if max_resident is not None and spill_file is None:
+            raise ValueError("A spill file is required to limit the resident games")
+
+        if max_resident is not None and max_resident < 1:
+            raise ValueError("At least one game must be kept in memory")
+
+        self.max_resident = max_resident
+        self.hot = OrderedDict()
+        self.dirty = set()
+        self.cold = None
+
+        if spill_file:
+            self.cold = sqlite3.connect(str(spill_file))
+            self.cold.execute(
+                "CREATE TABLE IF NOT EXISTS games (user TEXT PRIMARY KEY, game TEXT)"
+            )
+            self.cold.commit()
+
+    def __getitem__(self, user):
+        game = self.load(user)
+
+        if game is None:
+            raise KeyError(user)
+
+        # The returned game can be modified in place, so it has to be written again
+        self.dirty.add(user)
+        return game
+
+    def __contains__(self, user):
+        return self.load(user) is not None
+
+    def __setitem__(self, user, game):
+        self.hot[user] = game
+        self.hot.move_to_end(user)
+        self.dirty.add(user)
+        self.evict()
+
+    def __delitem__(self, user):
+        found = self.hot.pop(user, None) is not None
+        self.dirty.discard(user)
+
+        if self.cold is not None:
+            cursor = self.cold.execute("DELETE FROM games WHERE user = ?", (user,))
+            found = found or cursor.rowcount > 0
+
+        if not found:
+            raise KeyError(user)
+
+    def __iter__(self):
+        yield from list(self.hot)
+
+        if self.cold is not None:
+            for (user,) in self.cold.execute("SELECT user FROM games").fetchall():
+                if user not in self.hot:
+                    yield user
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def read(self, user):
+        """Read a game from the disk
+
+        :param user: name of the opponent
+        :return: the game or None if there is no game for this user on the disk
+        """
+        if self.cold is None:
+            return None
+
+        row = self.cold.execute(
+            "SELECT game FROM games WHERE user = ?", (user,)
+        ).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def write(self, games):
+        """Write games to the disk
+
+        :param games: list of pairs containing the name of the opponent and the game
+        """
+        self.cold.executemany(
+            "INSERT OR REPLACE INTO games (user, game) VALUES (?, ?)",
+            [(user, json.dumps(game)) for user, game in games],
+        )
+
+    def load(self, user):
+        """Get a game and make it the most recently used one, loading it from the disk if needed
+
+        :param user: name of the opponent
+        :return: the game or None if there is no game for this user
+        """
+        if user in self.hot:
+            self.hot.move_to_end(user)
+            return self.hot[user]
+
+        # Fault the game in from the disk
+        game = self.read(user)
+        if game is not None:
+            self.hot[user] = game
+            self.evict()
+
+        return game
+
+    def evict(self):
+        """Spill the least recently used games to the disk until the memory limit is respected"""
+        if self.max_resident is None:
+            return
+
+        evicted = []
+        while len(self.hot) > self.max_resident:
+            user, game = self.hot.popitem(last=False)
+            if user in self.dirty:
+                evicted.append((user, game))
+                self.dirty.discard(user)
+
+        if evicted:
+            self.write(evicted)
+
+    def flush(self):
+        """Write the resident games changed since the last write to the disk without evicting them"""
+        if self.cold is None:
+            return
+
+        self.write([(user, self.hot[user]) for user in self.dirty])
+        self.dirty.clear()
+        self.cold.commit()
+
+    def purge(self, predicate):
+        """Delete all games matching a condition, including the ones spilled to the disk
+
+        :param predicate: function called with a game, returning True if it should be deleted
+        :return: number of deleted games
+        """
+        users = [user for user, game in self.hot.items() if predicate(game)]
+
+        for user in users:
+            del self.hot[user]
+            self.dirty.discard(user)
+
+        if self.cold is not None:
+            for user, game in self.cold.execute("SELECT user, game FROM games"):
+                if user not in self.hot and predicate(json.loads(game)):
+                    users.append(user)
+
+            # Delete all games in a single batch
+            self.cold.executemany(
+                "DELETE FROM games WHERE user = ?", [(user,) for user in users]
+            )
+            self.cold.commit()
+
+        return len(set(users))
+
+    def to_dict(self):
+        """Get all games as a plain dictionary without loading the spilled games in memory
+
+        :return: dict mapping users to games
+        """
+        games = {}
+
+        if self.cold is not None:
+            for user, game in self.cold.execute("SELECT user, game FROM games"):
+                games[user] = json.loads(game)
+
+        games.update(self.hot)
+
+        return games
+
+    def close(self):
+        """Flush the resident games and close the spill file"""
+        self.flush()
+
+        if self.cold is not None:
+            self.cold.close()
+            self.cold = None
@@ -1,5 +1,17 @@
 """Module defining different Prisoner's Dilemma strategy functions"""
 
+import hashlib
+import inspect
+
+
+def get_strategy_hash(strategy):
+    """Compute a hash of the source code of a strategy function
+
+    :param strategy: function implementing a particular strategy
+    :return: hex digest of the strategy source code
+    """
+    return hashlib.sha256(inspect.getsource(strategy).encode()).hexdigest()
+
 
 def play_tit_for_tat(moves):
     """Tit For Tat strategy
@@ -35,3 +47,14 @@ def play_always_cooperate(_):
     :return: new move chosen by the strategy
     """
     return True
+
+
+def play_grudger(moves):
+    """Grudger strategy
+
+    This strategy plays C until the opponent plays D once and after that always plays D
+
+    :param moves: list of the moves history
+    :return: new move chosen by the strategy
+    """
+    return all(move[1] for move in moves)
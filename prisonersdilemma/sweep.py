@@ -0,0 +1,199 @@
+"""Module implementing parameter sweeps of Prisoner's Dilemma matches between strategies"""
+
+import json
+import hashlib
+import inspect
+import tempfile
+import itertools
+from pathlib import Path
+from prisonersdilemma.bot import PrisonersDilemmaBot
+from prisonersdilemma.strategy import get_strategy_hash
+
+
+def get_strategy_name(strategy):
+    """Get a short name of a strategy function
+
+    :param strategy: function implementing a particular strategy
+    :return: name of the strategy without the play_ prefix
+    """
+    name = strategy.__name__
+    return name[len("play_") :] if name.startswith("play_") else name
+
+
+def get_rules_hash():
+    """Compute a hash of the source code implementing the rules of the game
+
+    :return: hex digest of the bot methods playing a round and the match loop
+    """
+    sources = [
+        inspect.getsource(function)
+        for function in [
+            PrisonersDilemmaBot.play,
+            PrisonersDilemmaBot.get_next_state,
+            PrisonersDilemmaBot.get_payoffs,
+            play_match,
+        ]
+    ]
+    return hashlib.sha256("".join(sources).encode()).hexdigest()
+
+
+def play_match(strategy_1, strategy_2, game_matrix=(5, 3, 1, 0), moves_to_play=10):
+    """Play a full match between two strategies
+
+    The first strategy is played by a PrisonersDilemmaBot, so the match follows exactly the rules
+    of the live bot. The second strategy plays the role of the opponent.
+
+    :param strategy_1: function implementing the strategy of the bot
+    :param strategy_2: function implementing the strategy of the opponent
+    :param game_matrix: matrix with game payoffs, defaults to [5, 3, 1, 0]
+    :param moves_to_play: number of moves to play, defaults to 10
+    :return: The final game state - a dict containing the moves history and the scores
+    """
+    bot = PrisonersDilemmaBot(
+        strategy_1, game_matrix=game_matrix, moves_to_play=moves_to_play
+    )
+
+    game = bot.play("opponent", True)
+    while len(game["moves"]) < moves_to_play:
+        opponent_moves = [[move[1], move[0]] for move in game["moves"]]
+        game = bot.play("opponent", strategy_2(opponent_moves))
+
+    return game
+
+
+class SweepCache:
+    """On-disk cache of match results addressed by the content of the strategies and parameters
+
+    The keys also include a hash of the game rules, so the results are computed again after the
+    rules of the bot change.
+    """
+
+    def __init__(self, cache_dir):
+        """Initializes a new sweep cache
+
+        :param cache_dir: directory where the results are stored
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.rules_hash = get_rules_hash()
+
+    def get_key(self, strategy_1, strategy_2, game_matrix, moves_to_play):
+        """Compute the cache key of a single match
+
+        :return: hex digest identifying the match
+        """
+        content = json.dumps(
+            [
+                self.rules_hash,
+                get_strategy_hash(strategy_1),
+                get_strategy_hash(strategy_2),
+                list(game_matrix),
+                moves_to_play,
+            ]
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def get(self, key):
+        """Get a cached match result
+
+        :param key: cache key of the match
+        :return: the cached game or None if the match was not played yet
+        """
+        path = self.cache_dir / (key + ".json")
+        if not path.exists():
+            return None
+
+        with open(path) as json_file:
+            return json.load(json_file)
+
+    def put(self, key, game):
+        """Store a match result in the cache
+
+        :param key: cache key of the match
+        :param game: game state to store
+        """
+        path = self.cache_dir / (key + ".json")
+
+        # Write to a unique temporary file first to never leave a partial result in the cache,
+        # even if several sweeps run at the same time
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.cache_dir, suffix=".tmp", delete=False
+        ) as json_file:
+            json.dump(game, json_file)
+        Path(json_file.name).replace(path)
+
+
+def run_sweep(strategies, game_matrices, moves_to_play_values, cache=None):
+    """Play all pairs of strategies with all payoff matrices and game lengths
+
+    Only the matches missing from the cache are played.
+
+    :param strategies: list of strategy functions
+    :param game_matrices: list of payoff matrices
+    :param moves_to_play_values: list of game lengths
+    :param cache: SweepCache storing the results, defaults to no caching
+    :return: list of result rows - dicts containing the strategy names, the parameters and the
+    total points of both strategies
+    """
+    results = []
+
+    for strategy_1, strategy_2, game_matrix, moves_to_play in itertools.product(
+        strategies, strategies, game_matrices, moves_to_play_values
+    ):
+        game = None
+        if cache:
+            key = cache.get_key(strategy_1, strategy_2, game_matrix, moves_to_play)
+            game = cache.get(key)
+
+        if game is None:
+            game = play_match(strategy_1, strategy_2, game_matrix, moves_to_play)
+            if cache:
+                cache.put(key, game)
+
+        results.append(
+            dict(
+                strategy_1=get_strategy_name(strategy_1),
+                strategy_2=get_strategy_name(strategy_2),
+                game_matrix=list(game_matrix),
+                moves_to_play=moves_to_play,
+                points_1=game["total_points"][0],
+                points_2=game["total_points"][1],
+            )
+        )
+
+    return results
+
+
+def query_results(results, **criteria):
+    """Select the result rows matching all given criteria
+
+    :param results: list of result rows
+    :param criteria: column values to match, e.g. strategy_1="tit_for_tat"
+    :return: list of the matching result rows
+    """
+    return [
+        row
+        for row in results
+        if all(row[column] == value for column, value in criteria.items())
+    ]
+
+
+def format_results(results):
+    """Format the result rows as a tab separated table
+
+    :param results: list of result rows
+    :return: text of the table
+    """
+    columns = [
+        "strategy_1",
+        "strategy_2",
+        "game_matrix",
+        "moves_to_play",
+        "points_1",
+        "points_2",
+    ]
+    lines = ["\t".join(columns)]
+    for row in results:
+        lines.append("\t".join(str(row[column]) for column in columns))
+
+    return "\n".join(lines)
@@ -4,17 +4,22 @@ import os
 import re
 import json
 import time
+import hashlib
 import logging
 import argparse
 from pathlib import Path
 import tweepy
 from dotenv import load_dotenv
 import prisonersdilemma.strategy as strategy
+from prisonersdilemma.strategy import get_strategy_hash
 from prisonersdilemma.bot import PrisonersDilemmaBot
 
 
 load_dotenv()
 
+# Interval in seconds at which the expired games are deleted from the spill files
+PURGE_INTERVAL = 3600
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s\t%(levelname)s\t%(message)s",
@@ -90,6 +95,72 @@ def get_end_game_message(points, moves_to_play, cc_payoff, dd_payoff):
     return result_message + " " + score_message
 
 
+def get_game_update_message(game_state, moves_to_play, game_matrix):
+    """Get the message reporting the outcome of the last round
+
+    :param game_state: game state after the round
+    :param moves_to_play: number of moves to play
+    :param game_matrix: matrix with game payoffs
+    :return: text of the game update message
+    """
+    moves_played = len(game_state["moves"])
+    last_moves = game_state["moves"][-1]
+
+    # Check if the game is finished and prepare the message
+    if moves_played == moves_to_play:
+        end_game_message = get_end_game_message(
+            game_state["total_points"],
+            moves_to_play,
+            game_matrix[1],
+            game_matrix[2],
+        )
+    else:
+        end_game_message = MESSAGES["next_move"]
+
+    return MESSAGES["game_update"] % (
+        moves_played,
+        moves_to_play,
+        move_to_string(last_moves[1]),
+        move_to_string(last_moves[0]),
+        game_state["last_points"][1],
+        game_state["last_points"][0],
+        game_state["total_points"][1],
+        game_state["total_points"][0],
+        end_game_message,
+    )
+
+
+def get_bot_signature(bot):
+    """Compute a signature of the strategy and the game parameters of a bot
+
+    :param bot: Prisoner's Dilemma bot
+    :return: short hex digest identifying the strategy source code, the number of moves to play
+    and the payoffs
+    """
+    content = json.dumps(
+        [get_strategy_hash(bot.strategy), bot.moves_to_play, list(bot.game_matrix)]
+    )
+
+    # The signature is stored in every game, so only a prefix of the digest is kept
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+def speculate_move(game, bot, signature):
+    """Choose the next move of the bot ahead of the opponent's reply
+
+    :param game: current game state
+    :param bot: bot playing the game
+    :param signature: signature of the bot as computed by get_bot_signature
+    :return: dict containing the bot signature, the round the speculation is valid for and the
+    own move
+    """
+    return dict(
+        signature=signature,
+        round=len(game["moves"]),
+        own_move=bot.strategy(game["moves"]),
+    )
+
+
 def move_to_string(move):
     """Convert a Prisoner's Dilemma move to string"""
     return "✅" if move else "❌"
@@ -140,42 +211,183 @@ def parse_move(text):
     raise ValueError("No valid move found")
 
 
+def parse_mentions(text):
+    """Parse the Twitter handles mentioned in a text
+
+    :param text: text of the tweet
+    :return: set of the mentioned handles in upper case
+    """
+    return {mention.upper() for mention in re.findall("@([a-zA-Z0-9_]{1,15})", text)}
+
+
+def get_mentioned_handles(text, handles):
+    """Get the bot handles mentioned in a text
+
+    :param text: text of the tweet
+    :param handles: handles of the bots
+    :return: list of the bot handles mentioned in the text
+    """
+    mentions = parse_mentions(text)
+    return [handle for handle in handles if handle.upper() in mentions]
+
+
+def build_search_query(handles):
+    """Build a single search query matching the mentions of all bot handles
+
+    :param handles: handles of the bots
+    :return: search query
+    """
+    return " OR ".join("@" + handle for handle in handles)
+
+
+def get_handle_file(filename, handle):
+    """Get the path of a file specific to a bot handle
+
+    :param filename: path to the shared file
+    :param handle: handle of the bot
+    :return: path with the handle appended to the file name
+    """
+    path = Path(filename)
+    return path.with_name(f"{path.stem}_{handle}{path.suffix}")
+
+
+def parse_bot(bot_spec):
+    """Parse a bot specification given as HANDLE:STRATEGY
+
+    :param bot_spec: bot specification, e.g. DilemmaBot:tit_for_tat
+    :raises ValueError: raises an exception if the specification or the strategy is invalid
+    :return: pair containing the handle and the strategy function
+    """
+    handle, _, strategy_name = bot_spec.partition(":")
+    strategy_function = getattr(strategy, "play_" + strategy_name, None)
+
+    if not handle or not strategy_function:
+        raise ValueError("Invalid bot specification: " + bot_spec)
+
+    return handle.lstrip("@"), strategy_function
+
+
+def create_twitter_api(handle=None, fallback=True):
+    """Authenticate and create a Twitter API object
+
+    :param handle: handle whose access token should be used, defaults to the default access token
+    :param fallback: use the default access token if the handle has no access token, defaults
+    to True
+    :raises ValueError: raises an exception if the handle has no access token and the fallback
+    is disabled
+    :return: API object
+    """
+    prefix = handle.upper() + "_" if handle else ""
+    access_token = os.getenv(prefix + "ACCESS_TOKEN")
+    access_token_secret = os.getenv(prefix + "ACCESS_TOKEN_SECRET")
+
+    if not access_token or not access_token_secret:
+        if not fallback:
+            raise ValueError(
+                "Missing %sACCESS_TOKEN or %sACCESS_TOKEN_SECRET" % (prefix, prefix)
+            )
+
+        access_token = os.getenv("ACCESS_TOKEN")
+        access_token_secret = os.getenv("ACCESS_TOKEN_SECRET")
+
+    auth = tweepy.OAuthHandler(os.getenv("API_KEY"), os.getenv("API_SECRET"))
+    auth.set_access_token(access_token, access_token_secret)
+    return tweepy.API(auth)
+
+
 class PrisonersDilemmaTwitterClient:
-    """Twitter client for the Prisoner's Dilemma bot"""
+    """Twitter client for the Prisoner's Dilemma bot
+
+    The client can serve several bot handles at the same time. All handles are searched with a
+    single query and every tweet is dispatched to the bots mentioned in it. Each bot has its own
+    strategy and active games.
+    """
 
-    def __init__(self, interval, state_file, active_games_file, archive_file=None):
-        """Initialize the Twitter Client"""
+    def __init__(
+        self,
+        interval,
+        state_file,
+        active_games_file,
+        archive_file=None,
+        max_resident_games=None,
+        spill_file=None,
+        bots=None,
+    ):
+        """Initialize the Twitter Client
+
+        :param bots: dict mapping the bot handles to their strategy functions, defaults to
+        @DilemmaBot playing tit for tat
+        """
         logging.info("Starting the Prisoner's Dilemma Twitter Bot")
 
+        if not bots:
+            bots = dict(DilemmaBot=strategy.play_tit_for_tat)
+
         # Init the object attributes
         self.interval = interval
         self.state_file = Path(state_file)
-        self.active_games_file = Path(active_games_file)
         self.archive_file = Path(archive_file)
+        self.search_query = build_search_query(bots)
+        self.last_purge_time = 0
+
+        # The first handle keeps the given game files, so its games survive adding more handles.
+        # The other handles use separate files with their handle appended.
+        self.active_games_files = {}
+        self.spill_files = {}
+        for index, handle in enumerate(bots):
+            self.active_games_files[handle] = Path(active_games_file)
+            self.spill_files[handle] = Path(spill_file) if spill_file else None
+
+            if index > 0:
+                self.active_games_files[handle] = get_handle_file(
+                    active_games_file, handle
+                )
+                if spill_file:
+                    self.spill_files[handle] = get_handle_file(spill_file, handle)
 
         # Initilize the API
         logging.info("Initializing Twitter API")
-        self.init_twitter_api()
+        self.init_twitter_api(bots)
 
         # Load the state
         logging.info("Loading the bot state from %s", state_file)
         self.load_state()
 
-        # Initialize the bot
-        self.bot = PrisonersDilemmaBot(strategy.play_tit_for_tat, moves_to_play=10)
+        # Initialize the bots
+        self.bots = {}
+        for handle, strategy_function in bots.items():
+            logging.info("Initializing the bot @%s", handle)
+            self.bots[handle] = PrisonersDilemmaBot(
+                strategy_function,
+                moves_to_play=10,
+                max_resident_games=max_resident_games,
+                spill_file=self.spill_files[handle],
+            )
         self.load_active_games()
 
-    def init_twitter_api(self):
+        # Replies pre-rendered by another strategy or with other game parameters are not reused
+        self.signatures = {
+            handle: get_bot_signature(bot) for handle, bot in self.bots.items()
+        }
+        self.pending_speculations = set()
+
+    def init_twitter_api(self, handles):
         """Authenticat and initilize the Twitter API
 
-        :return: API obejct
+        The search API uses the default access token. Each bot handle replies using the access
+        token from the environment variables prefixed with its handle in upper case, e.g.
+        DILEMMABOT_ACCESS_TOKEN. Only the first handle may fall back to the default access token,
+        otherwise the replies of the other handles would be posted by the wrong account.
+
+        :param handles: handles of the bots
+        :raises ValueError: raises an exception if a handle other than the first one has no
+        access token
         """
-        auth = tweepy.OAuthHandler(os.getenv("API_KEY"), os.getenv("API_SECRET"))
-        auth.set_access_token(
-            os.getenv("ACCESS_TOKEN"),
-            os.getenv("ACCESS_TOKEN_SECRET"),
-        )
-        self.twitter_api = tweepy.API(auth)
+        self.twitter_api = create_twitter_api()
+        self.reply_apis = {
+            handle: create_twitter_api(handle, fallback=index == 0)
+            for index, handle in enumerate(handles)
+        }
 
     def load_state(self):
         """Load the state of the bot from a JSON file"""
@@ -191,93 +403,152 @@ class PrisonersDilemmaTwitterClient:
             return json.dump(self.state, state_file_json)
 
     def load_active_games(self):
-        """Load the active games from a JSON file"""
-        if self.active_games_file.exists():
-            self.bot.load_active_games(self.active_games_file)
+        """Load the active games of all bots from JSON files
+
+        When a spill file is used, the games are already persisted there and nothing is loaded.
+        """
+        for handle, bot in self.bots.items():
+            active_games_file = self.active_games_files[handle]
+            if not self.spill_files[handle] and active_games_file.exists():
+                bot.load_active_games(active_games_file)
 
     def save_active_games(self):
-        """Save the active games to a JSON file"""
-        self.bot.save_active_games(self.active_games_file)
+        """Save the active games of all bots to JSON files or flush them to the spill files
 
-    def save_game_to_archive(self, user, game):
+        Purging the expired games requires reading the whole spill file, so it is done only once
+        every PURGE_INTERVAL seconds.
+        """
+        purge = time.time() - self.last_purge_time > PURGE_INTERVAL
+        if purge:
+            self.last_purge_time = time.time()
+
+        for handle, bot in self.bots.items():
+            if self.spill_files[handle]:
+                if purge:
+                    logging.info(
+                        "Purged %d expired games of @%s",
+                        bot.purge_expired_games(),
+                        handle,
+                    )
+                bot.active_games.flush()
+            else:
+                bot.save_active_games(self.active_games_files[handle])
+
+    def save_game_to_archive(self, handle, user, game):
         """Save a finished game to the archive
 
+        :param handle: handle of the bot that played the game
+        :param user: opponent of the bot
         :param game: Game to save
         """
         if self.archive_file:
             game["user"] = user
+            game["bot"] = handle
             with open(self.archive_file, "a") as archive:
                 json.dump(game, archive)
                 archive.write("\n")
 
-    def reply_to_tweet(self, text, tweet_id):
+    def reply_to_tweet(self, handle, text, tweet_id):
         """Reply to a tweet
 
+        :param handle: handle of the bot replying
         :param text: text of the reply
         :param id: ID of the tweet to reply to
         """
-        self.twitter_api.update_status(
+        self.reply_apis[handle].update_status(
             text, in_reply_to_status_id=tweet_id, auto_populate_reply_metadata=True
         )
 
     def process_tweet(self, tweet):
-        """Process a single tweet
+        """Process a single tweet and dispatch it to all bots mentioned in it
 
+        :param tweet: Tweet mentioning one or more bots
+        """
+        # Ignore the replies of the bots themselves
+        if tweet.user.screen_name.upper() in (handle.upper() for handle in self.bots):
+            return
+
+        for handle in get_mentioned_handles(tweet.text, self.bots):
+            self.process_bot_tweet(handle, tweet)
+
+    def process_bot_tweet(self, handle, tweet):
+        """Process a single tweet for one bot
+
+        :param handle: handle of the bot
         :param tweet: Tweet mentioning the bot
         """
+        bot = self.bots[handle]
         user = tweet.user.screen_name
+
+        # Discard the game together with its pre-rendered replies if the user didn't play for a
+        # long time
+        if bot.is_user_playing(user) and bot.is_game_expired(bot.active_games[user]):
+            logging.info("Game between @%s and %s timed out", handle, user)
+            del bot.active_games[user]
+
         # Check if the user starts a new game
-        if not self.bot.is_user_playing(user):
+        if not bot.is_user_playing(user):
             if check_new_game_tweet(tweet):
-                logging.info("Starting a new game with %s", user)
-                self.bot.play(user, True)
-                self.reply_to_tweet(MESSAGES["rules"], tweet.id)
+                logging.info("Starting a new game between @%s and %s", handle, user)
+                bot.play(user, True)
+                self.reply_to_tweet(handle, MESSAGES["rules"], tweet.id)
+                self.pending_speculations.add((handle, user))
             return
 
         # Parse the move
         try:
             move = parse_move(tweet.text)
         except ValueError:
-            logging.info("Cannot parse the reply from %s", user)
-            self.reply_to_tweet(MESSAGES["invalid_move"], tweet.id)
+            logging.info("Cannot parse the reply from %s to @%s", user, handle)
+            self.reply_to_tweet(handle, MESSAGES["invalid_move"], tweet.id)
             return
 
-        # Play one round of the game
-        game_state = self.bot.play(user, move)
+        # Play one round of the game using the precomputed move if it is still valid
+        game = bot.active_games[user]
+        speculation = game.pop("speculation", None)
+        own_move = None
+        if (
+            speculation
+            and speculation["signature"] == self.signatures[handle]
+            and speculation["round"] == len(game["moves"])
+        ):
+            own_move = speculation["own_move"]
+
+        game_state = bot.play(user, move, own_move=own_move)
+        reply = get_game_update_message(game_state, bot.moves_to_play, bot.game_matrix)
+
         moves_played = len(game_state["moves"])
-        last_moves = game_state["moves"][-1]
+        logging.info("Played round %d between @%s and %s", moves_played, handle, user)
 
-        logging.info("Played round %d with %s", moves_played, user)
+        # Archive the game if it is finished
+        if moves_played == bot.moves_to_play:
+            self.save_game_to_archive(handle, user, game_state)
 
-        # Check if the game is finished and prepare the message
-        if moves_played == self.bot.moves_to_play:
-            end_game_message = get_end_game_message(
-                game_state["total_points"],
-                self.bot.moves_to_play,
-                self.bot.game_matrix[1],
-                self.bot.game_matrix[2],
-            )
+        # Reply to the tweet and choose the next move after the batch
+        self.reply_to_tweet(handle, reply, tweet.id)
+        self.pending_speculations.add((handle, user))
 
-            self.save_game_to_archive(user, game_state)
-        else:
-            end_game_message = MESSAGES["next_move"]
-
-        # Reply to the tweet depending on the game state
-        self.reply_to_tweet(
-            MESSAGES["game_update"]
-            % (
-                moves_played,
-                self.bot.moves_to_play,
-                move_to_string(last_moves[1]),
-                move_to_string(last_moves[0]),
-                game_state["last_points"][1],
-                game_state["last_points"][0],
-                game_state["total_points"][1],
-                game_state["total_points"][0],
-                end_game_message,
-            ),
-            tweet.id,
-        )
+    def speculate_pending(self):
+        """Choose the next moves for all games played since the last call"""
+        for handle, user in self.pending_speculations:
+            self.speculate(handle, user)
+
+        self.pending_speculations.clear()
+
+    def speculate(self, handle, user):
+        """Choose the next move of the bot in the game with a user
+
+        Only the move is stored in the game, so it is discarded together with the game on timeout
+        and is persisted or spilled to the disk with it. The reply is rendered once the user's move
+        is known.
+
+        :param handle: handle of the bot
+        :param user: name of the opponent
+        """
+        bot = self.bots[handle]
+        if bot.is_user_playing(user):
+            game = bot.active_games[user]
+            game["speculation"] = speculate_move(game, bot, self.signatures[handle])
 
     def run(self):
         """Periodically search for new tweets and reply"""
@@ -287,7 +558,7 @@ class PrisonersDilemmaTwitterClient:
         while True:
             try:
                 tweets = self.twitter_api.search(
-                    "@DilemmaBot", since_id=self.state["last_status_id"]
+                    self.search_query, since_id=self.state["last_status_id"]
                 )
 
                 if len(tweets) > 0:
@@ -308,6 +579,7 @@ class PrisonersDilemmaTwitterClient:
                         logging.error("Problem updating the status: %s", str(err))
                         break
 
+                self.speculate_pending()
                 self.save_state()
                 self.save_active_games()
 
@@ -365,6 +637,34 @@ def parse_args():
         help="File storing the games that were finished as an archive",
     )
 
+    parser.add_argument(
+        "-m",
+        "--max-resident-games",
+        dest="max_resident_games",
+        action="store",
+        type=int,
+        default=None,
+        help="Maximum number of active games kept in memory (requires --spill)",
+    )
+
+    parser.add_argument(
+        "--spill",
+        dest="spill_file",
+        action="store",
+        default=None,
+        help="SQLite database file where idle active games are spilled to and persisted",
+    )
+
+    parser.add_argument(
+        "-b",
+        "--bot",
+        dest="bots",
+        action="append",
+        default=None,
+        help="Bot handle and strategy to serve as HANDLE:STRATEGY, e.g. DilemmaBot:tit_for_tat "
+        "(can be given multiple times, defaults to DilemmaBot:tit_for_tat)",
+    )
+
     return parser.parse_args()
 
 
@@ -374,6 +674,12 @@ if __name__ == "__main__":
 
     # Create and run the Twitter client
     client = PrisonersDilemmaTwitterClient(
-        int(args.interval), args.state_file, args.games_file, args.archive_file
+        int(args.interval),
+        args.state_file,
+        args.games_file,
+        args.archive_file,
+        args.max_resident_games,
+        args.spill_file,
+        dict(parse_bot(bot_spec) for bot_spec in args.bots) if args.bots else None,
     )
     client.run()
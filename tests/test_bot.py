@@ -121,3 +121,20 @@ def test_save_and_load():
         bot_2.load_active_games(Path(tempdir.path, "games.json"))
 
     assert bot_1.active_games == bot_2.active_games
+
+
+def test_precomputed_move():
+    """Test playing a move chosen by the strategy in advance"""
+    bot = PrisonersDilemmaBot(strategy.play_tit_for_tat, moves_to_play=2)
+
+    bot.play("test_user", "@DilemmaBot let's play")
+    game = bot.active_games["test_user"]
+
+    expect_game_state(
+        bot.get_next_state(game, True, False), [[True, False]], [0, 5], [0, 5]
+    )
+    expect_game_state(game, [], [0, 0], [0, 0])
+
+    expect_game_state(
+        bot.play("test_user", False, own_move=False), [[False, False]], [1, 1], [1, 1]
+    )
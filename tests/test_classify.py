@@ -0,0 +1,136 @@
+"""Tests for the classification of the opponents' strategies"""
+
+import json
+from pathlib import Path
+from testfixtures import TempDirectory
+from prisonersdilemma.classify import (
+    StrategyClassifier,
+    classify_archive,
+    decode_history,
+)
+from prisonersdilemma.sweep import play_match
+import prisonersdilemma.strategy as strategy
+
+
+def make_game(user, bot_strategy, opponent_strategy, moves_to_play=10):
+    """Helper function to create an archived game between two strategies
+
+    :param user: name of the opponent
+    :param bot_strategy: strategy of the bot
+    :param opponent_strategy: strategy of the opponent
+    :param moves_to_play: number of moves to play
+    """
+    game = play_match(bot_strategy, opponent_strategy, moves_to_play=moves_to_play)
+    game["user"] = user
+    return game
+
+
+def test_decode_history():
+    """Test decoding a history key"""
+    assert decode_history(0) == []
+    assert decode_history(2 * 32 + 1) == [[True, False]]
+    assert decode_history((1 + 2 * 4) * 32 + 2) == [[False, True], [True, False]]
+
+
+def test_classify():
+    """Test classifying opponents playing the classic strategies"""
+    games = [
+        make_game(
+            "cooperator", strategy.play_always_defect, strategy.play_always_cooperate
+        ),
+        make_game("defector", strategy.play_tit_for_tat, strategy.play_always_defect),
+        make_game("copycat", strategy.play_always_defect, strategy.play_tit_for_tat),
+        dict(user="grudge", moves=[[False, True], [True, False], [True, False]]),
+    ]
+
+    classifier = StrategyClassifier()
+    classifier.add_games(games)
+    results = classifier.classify()
+
+    assert [result["strategy"] for result in results] == [
+        "always_cooperate",
+        "always_defect",
+        "tit_for_tat",
+        "grudger",
+    ]
+    assert [result["score"] for result in results] == [1.0, 1.0, 1.0, 1.0]
+
+
+def test_partial_match():
+    """Test the score of an opponent that doesn't follow any strategy exactly"""
+    game = dict(
+        user="random",
+        moves=[[True, True], [True, False], [True, False], [True, False]],
+    )
+
+    classifier = StrategyClassifier(
+        dict(
+            always_defect=strategy.play_always_defect,
+            tit_for_tat=strategy.play_tit_for_tat,
+        )
+    )
+
+    classifier.add_games([game])
+
+    assert classifier.classify() == [
+        dict(user="random", games=1, strategy="always_defect", score=0.75)
+    ]
+
+
+def test_limited_predictions():
+    """Test that the remembered predictions are limited"""
+    games = [
+        make_game("user_1", strategy.play_tit_for_tat, strategy.play_always_defect, 3),
+        make_game("user_2", strategy.play_always_defect, strategy.play_grudger, 3),
+    ]
+
+    classifier = StrategyClassifier(max_predictions=4)
+    classifier.add_games(games[:1])
+    classifier.add_games(games[1:])
+
+    assert len(classifier.predictions) <= 4
+
+    # The limit holds even if a single batch has more distinct histories
+    classifier.add_games(games + games)
+
+    assert len(classifier.predictions) <= 4
+
+    unlimited_classifier = StrategyClassifier()
+    unlimited_classifier.add_games(games)
+    unlimited_classifier.add_games(games + games)
+
+    assert classifier.classify() == unlimited_classifier.classify()
+
+
+def test_classify_archive():
+    """Test classifying the players of the archive in multiple chunks"""
+    games = [
+        make_game("user_%d" % index, strategy.play_tit_for_tat, strategy.play_grudger)
+        for index in range(3)
+    ]
+
+    # The player resembles different strategies in each game, but tit for tat overall
+    games += [
+        make_game("mixed", strategy.play_tit_for_tat, strategy.play_always_defect),
+        make_game("mixed", strategy.play_tit_for_tat, strategy.play_always_cooperate),
+        make_game("mixed", strategy.play_tit_for_tat, strategy.play_always_defect),
+    ]
+
+    with TempDirectory() as tempdir:
+        archive_file = Path(tempdir.path, "archive.json")
+        with open(archive_file, "w") as archive:
+            for game in games:
+                json.dump(game, archive)
+                archive.write("\n")
+
+        results = classify_archive(archive_file, chunk_size=2)
+
+        # All games of a player in a single chunk are added up as well
+        assert classify_archive(archive_file, chunk_size=10) == results
+
+    assert results == [
+        dict(user="user_0", games=1, strategy="always_cooperate", score=1.0),
+        dict(user="user_1", games=1, strategy="always_cooperate", score=1.0),
+        dict(user="user_2", games=1, strategy="always_cooperate", score=1.0),
+        dict(user="mixed", games=3, strategy="tit_for_tat", score=26 / 30),
+    ]
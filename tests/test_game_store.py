@@ -0,0 +1,161 @@
+"""Tests for the tiered game store"""
+
+from pathlib import Path
+import pytest
+from testfixtures import TempDirectory
+from prisonersdilemma.game_store import GameStore
+from prisonersdilemma.bot import PrisonersDilemmaBot
+import prisonersdilemma.strategy as strategy
+
+
+def test_unbounded_store():
+    """Test that a store without limit behaves like a dict"""
+    store = GameStore()
+
+    store["test_user_1"] = dict(moves=[])
+    store["test_user_2"] = dict(moves=[[True, True]])
+
+    assert store == {
+        "test_user_1": dict(moves=[]),
+        "test_user_2": dict(moves=[[True, True]]),
+    }
+    assert "test_user_1" in store
+
+    del store["test_user_1"]
+
+    assert "test_user_1" not in store
+    assert len(store) == 1
+
+
+def test_missing_spill_file():
+    """Test that limiting the memory requires a spill file"""
+    with pytest.raises(ValueError):
+        GameStore(max_resident=1)
+
+
+def test_spill_and_fault_in():
+    """Test that the least recently used games are spilled and loaded back on access"""
+    with TempDirectory() as tempdir:
+        store = GameStore(max_resident=2, spill_file=Path(tempdir.path, "games"))
+
+        store["test_user_1"] = dict(moves=[])
+        store["test_user_2"] = dict(moves=[])
+        store["test_user_1"]["moves"].append([True, True])
+        store["test_user_3"] = dict(moves=[])
+
+        assert list(store.hot) == ["test_user_1", "test_user_3"]
+        assert len(store) == 3
+
+        assert store["test_user_2"] == dict(moves=[])
+        assert list(store.hot) == ["test_user_3", "test_user_2"]
+        assert store["test_user_1"] == dict(moves=[[True, True]])
+
+        del store["test_user_1"]
+
+        assert "test_user_1" not in store
+        assert sorted(store) == ["test_user_2", "test_user_3"]
+
+        store.close()
+
+
+def test_store_persistence():
+    """Test that flushed games are available after reopening the spill file"""
+    with TempDirectory() as tempdir:
+        store_1 = GameStore(max_resident=1, spill_file=Path(tempdir.path, "games"))
+        store_1["test_user_1"] = dict(moves=[[True, False]])
+        store_1["test_user_2"] = dict(moves=[])
+        store_1.close()
+
+        store_2 = GameStore(max_resident=1, spill_file=Path(tempdir.path, "games"))
+
+        assert store_2.to_dict() == {
+            "test_user_1": dict(moves=[[True, False]]),
+            "test_user_2": dict(moves=[]),
+        }
+        assert len(store_2.hot) == 0
+
+        store_2.close()
+
+
+def test_bot_with_bounded_memory():
+    """Test playing more parallel games than the number of resident games"""
+    with TempDirectory() as tempdir:
+        bot = PrisonersDilemmaBot(
+            strategy.play_tit_for_tat,
+            moves_to_play=2,
+            max_resident_games=1,
+            spill_file=Path(tempdir.path, "games"),
+        )
+
+        bot.play("test_user_1", "@DilemmaBot let's play")
+        bot.play("test_user_2", "@DilemmaBot let's play")
+
+        assert bot.is_user_playing("test_user_1")
+        assert bot.play("test_user_1", False)["total_points"] == [0, 5]
+        assert bot.play("test_user_2", True)["total_points"] == [3, 3]
+        assert bot.play("test_user_1", True)["total_points"] == [5, 5]
+
+        assert not bot.is_user_playing("test_user_1")
+        assert len(bot.active_games.hot) <= 1
+
+        bot.active_games.close()
+
+
+def test_invalid_memory_limit():
+    """Test that at least one game must be kept in memory"""
+    with TempDirectory() as tempdir:
+        with pytest.raises(ValueError):
+            GameStore(max_resident=0, spill_file=Path(tempdir.path, "games"))
+
+
+def test_flush_only_changed_games():
+    """Test that only the games accessed since the last write are written again"""
+    with TempDirectory() as tempdir:
+        store = GameStore(max_resident=2, spill_file=Path(tempdir.path, "games"))
+
+        store["test_user_1"] = dict(moves=[])
+        store["test_user_2"] = dict(moves=[])
+        store.flush()
+
+        # Changes to the disk copy are kept if the resident game was not accessed
+        store.write(
+            [
+                ("test_user_1", dict(moves=[[True, True]])),
+                ("test_user_2", dict(moves=[[True, True]])),
+            ]
+        )
+        assert "test_user_1" in store
+        store["test_user_2"]["moves"].append([False, False])
+        store.flush()
+
+        assert store.read("test_user_1") == dict(moves=[[True, True]])
+        assert store.read("test_user_2") == dict(moves=[[False, False]])
+
+        store.close()
+
+
+def test_purge():
+    """Test deleting the resident and the spilled games matching a condition"""
+    with TempDirectory() as tempdir:
+        store = GameStore(max_resident=1, spill_file=Path(tempdir.path, "games"))
+
+        store["test_user_1"] = dict(last_time=0)
+        store["test_user_2"] = dict(last_time=10)
+        store["test_user_3"] = dict(last_time=0)
+
+        assert store.purge(lambda game: game["last_time"] == 0) == 2
+        assert list(store) == ["test_user_2"]
+
+        store.close()
+
+
+def test_bot_purge_expired_games():
+    """Test that the bot deletes the expired games"""
+    bot = PrisonersDilemmaBot(strategy.play_tit_for_tat)
+
+    bot.play("test_user_1", "@DilemmaBot let's play")
+    bot.play("test_user_2", "@DilemmaBot let's play")
+    bot.active_games["test_user_1"]["last_time"] -= 200000
+
+    assert bot.purge_expired_games() == 1
+    assert list(bot.active_games) == ["test_user_2"]
@@ -35,3 +35,14 @@ def test_always_cooperate():
     assert strategy([(True, False)])
     assert strategy([(False, True)])
     assert strategy([(False, False)])
+
+
+def test_grudger():
+    """Test the grudger strategy"""
+    strategy = prisonersdilemma.strategy.play_grudger
+
+    assert strategy([])
+    assert strategy([(True, True)])
+    assert strategy([(False, True)])
+    assert not strategy([(True, False)])
+    assert not strategy([(True, False), (False, True), (False, True)])
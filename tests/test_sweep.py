@@ -0,0 +1,97 @@
+"""Tests for the parameter sweeps"""
+
+from testfixtures import TempDirectory
+from prisonersdilemma.sweep import (
+    SweepCache,
+    play_match,
+    run_sweep,
+    query_results,
+    format_results,
+)
+import prisonersdilemma.strategy as strategy
+
+
+def test_play_match():
+    """Test playing a match between two strategies"""
+    game = play_match(
+        strategy.play_tit_for_tat, strategy.play_always_defect, moves_to_play=3
+    )
+
+    assert game["moves"] == [[True, False], [False, False], [False, False]]
+    assert game["total_points"] == [2, 7]
+
+    game = play_match(
+        strategy.play_always_defect,
+        strategy.play_tit_for_tat,
+        game_matrix=(4, 2, 1, 0),
+        moves_to_play=2,
+    )
+
+    assert game["total_points"] == [5, 1]
+
+
+def test_sweep_cache():
+    """Test that only the matches missing from the cache are played"""
+    strategies = [strategy.play_tit_for_tat, strategy.play_always_defect]
+
+    with TempDirectory() as tempdir:
+        cache = SweepCache(tempdir.path)
+
+        results_1 = run_sweep(strategies, [(5, 3, 1, 0)], [2], cache)
+        assert len(list(cache.cache_dir.glob("*.json"))) == 4
+
+        key = cache.get_key(
+            strategy.play_tit_for_tat, strategy.play_always_defect, (5, 3, 1, 0), 2
+        )
+        game = cache.get(key)
+        game["total_points"] = [100, 100]
+        cache.put(key, game)
+
+        results_2 = run_sweep(strategies, [(5, 3, 1, 0)], [2, 3], cache)
+        assert len(list(cache.cache_dir.glob("*.json"))) == 8
+        assert results_2[0] == results_1[0]
+
+        assert query_results(
+            results_2,
+            strategy_1="tit_for_tat",
+            strategy_2="always_defect",
+            moves_to_play=2,
+        ) == [
+            dict(
+                strategy_1="tit_for_tat",
+                strategy_2="always_defect",
+                game_matrix=[5, 3, 1, 0],
+                moves_to_play=2,
+                points_1=100,
+                points_2=100,
+            )
+        ]
+
+
+def test_format_results():
+    """Test formatting the results as a table"""
+    results = run_sweep([strategy.play_always_cooperate], [(5, 3, 1, 0)], [2])
+
+    assert format_results(results) == (
+        "strategy_1\tstrategy_2\tgame_matrix\tmoves_to_play\tpoints_1\tpoints_2\n"
+        "always_cooperate\talways_cooperate\t[5, 3, 1, 0]\t2\t6\t6"
+    )
+
+
+def test_sweep_cache_rules():
+    """Test that the cached results are not reused after the game rules change"""
+    with TempDirectory() as tempdir:
+        cache = SweepCache(tempdir.path)
+        key = cache.get_key(
+            strategy.play_tit_for_tat, strategy.play_always_defect, (5, 3, 1, 0), 2
+        )
+        cache.put(key, dict(total_points=[1, 1]))
+
+        assert cache.get(key) == dict(total_points=[1, 1])
+        assert list(cache.cache_dir.glob("*.tmp")) == []
+
+        cache.rules_hash = "changed rules"
+
+        assert key != cache.get_key(
+            strategy.play_tit_for_tat, strategy.play_always_defect, (5, 3, 1, 0), 2
+        )
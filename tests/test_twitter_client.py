@@ -1,7 +1,12 @@
 """Tests for the Twitter client"""
 
+from types import SimpleNamespace
+from unittest import mock
 import pytest
+from testfixtures import TempDirectory
+import prisonersdilemma.strategy
 import prisonersdilemma.twitter_client as twitter_client
+from prisonersdilemma.bot import PrisonersDilemmaBot
 
 
 def test_parse_move():
@@ -33,3 +38,266 @@ def test_parse_move():
 
     with pytest.raises(ValueError):
         twitter_client.parse_move("No correct move")
+
+
+def test_get_mentioned_handles():
+    """Test dispatching a tweet to the mentioned bot handles"""
+    handles = ["DilemmaBot", "GrudgeBot"]
+
+    assert twitter_client.get_mentioned_handles("@DilemmaBot play", handles) == [
+        "DilemmaBot"
+    ]
+    assert twitter_client.get_mentioned_handles("@grudgebot C", handles) == [
+        "GrudgeBot"
+    ]
+    assert twitter_client.get_mentioned_handles("@GrudgeBot @DilemmaBot", handles) == [
+        "DilemmaBot",
+        "GrudgeBot",
+    ]
+    assert twitter_client.get_mentioned_handles("@DilemmaBotFan play", handles) == []
+
+
+def test_build_search_query():
+    """Test building a single search query for all bot handles"""
+    assert twitter_client.build_search_query(["DilemmaBot"]) == "@DilemmaBot"
+    assert (
+        twitter_client.build_search_query(["DilemmaBot", "GrudgeBot"])
+        == "@DilemmaBot OR @GrudgeBot"
+    )
+
+
+def test_parse_bot():
+    """Test parsing the bot handle and strategy"""
+    assert twitter_client.parse_bot("DilemmaBot:tit_for_tat") == (
+        "DilemmaBot",
+        prisonersdilemma.strategy.play_tit_for_tat,
+    )
+    assert twitter_client.parse_bot("@DefectBot:always_defect") == (
+        "DefectBot",
+        prisonersdilemma.strategy.play_always_defect,
+    )
+
+    with pytest.raises(ValueError):
+        twitter_client.parse_bot("DilemmaBot:unknown")
+
+    with pytest.raises(ValueError):
+        twitter_client.parse_bot(":tit_for_tat")
+
+
+def test_speculate_move():
+    """Test that the precomputed move matches the move chosen by the strategy"""
+    bot = PrisonersDilemmaBot(
+        prisonersdilemma.strategy.play_tit_for_tat, moves_to_play=2
+    )
+    bot.play("test_user", True)
+
+    speculation = twitter_client.speculate_move(
+        bot.active_games["test_user"], bot, "signature"
+    )
+    assert speculation == dict(signature="signature", round=0, own_move=True)
+
+    bot.play("test_user", False)
+
+    speculation = twitter_client.speculate_move(
+        bot.active_games["test_user"], bot, "signature"
+    )
+    assert speculation == dict(signature="signature", round=1, own_move=False)
+
+
+def make_client(tempdir, bots):
+    """Helper function to create a Twitter client with mocked Twitter APIs
+
+    :param tempdir: directory where the client files are stored
+    :param bots: dict mapping the bot handles to their strategy functions
+    """
+    with mock.patch.object(
+        twitter_client, "create_twitter_api", lambda *args, **kwargs: mock.Mock()
+    ):
+        return twitter_client.PrisonersDilemmaTwitterClient(
+            10,
+            tempdir.getpath("state.json"),
+            tempdir.getpath("games.json"),
+            tempdir.getpath("archive.json"),
+            bots=bots,
+        )
+
+
+def make_tweet(user, text, in_reply_to_status_id=None):
+    """Helper function to create a tweet
+
+    :param user: name of the author
+    :param text: text of the tweet
+    :param in_reply_to_status_id: ID of the tweet this tweet replies to
+    """
+    return SimpleNamespace(
+        id=1,
+        user=SimpleNamespace(screen_name=user),
+        text=text,
+        in_reply_to_status_id=in_reply_to_status_id,
+    )
+
+
+def get_replies(client, handle):
+    """Helper function to get the texts of all replies posted by a bot
+
+    :param client: Twitter client
+    :param handle: handle of the bot
+    """
+    return [
+        call.args[0] for call in client.reply_apis[handle].update_status.call_args_list
+    ]
+
+
+def test_process_tweet_dispatch():
+    """Test dispatching the tweets to the mentioned bots"""
+    with TempDirectory() as tempdir:
+        client = make_client(
+            tempdir,
+            dict(
+                DilemmaBot=prisonersdilemma.strategy.play_tit_for_tat,
+                DefectBot=prisonersdilemma.strategy.play_always_defect,
+            ),
+        )
+
+        client.process_tweet(make_tweet("test_user", "@DilemmaBot @DefectBot play"))
+        assert get_replies(client, "DilemmaBot") == [twitter_client.MESSAGES["rules"]]
+        assert get_replies(client, "DefectBot") == [twitter_client.MESSAGES["rules"]]
+
+        client.process_tweet(make_tweet("test_user", "@defectbot C", 1))
+        assert len(get_replies(client, "DilemmaBot")) == 1
+        assert "My move: ❌" in get_replies(client, "DefectBot")[-1]
+        assert len(client.bots["DefectBot"].active_games["test_user"]["moves"]) == 1
+        assert client.bots["DilemmaBot"].active_games["test_user"]["moves"] == []
+
+        # The tweets of the bots themselves are ignored
+        client.process_tweet(make_tweet("DefectBot", "@DilemmaBot let's play"))
+        assert not client.bots["DilemmaBot"].is_user_playing("DefectBot")
+        assert len(get_replies(client, "DilemmaBot")) == 1
+
+
+def test_missing_access_token(monkeypatch):
+    """Test that only the default handle can use the default access token"""
+    monkeypatch.setenv("ACCESS_TOKEN", "token")
+    monkeypatch.setenv("ACCESS_TOKEN_SECRET", "secret")
+    monkeypatch.delenv("DEFECTBOT_ACCESS_TOKEN", raising=False)
+    monkeypatch.delenv("DEFECTBOT_ACCESS_TOKEN_SECRET", raising=False)
+
+    assert twitter_client.create_twitter_api("DefectBot")
+
+    with pytest.raises(ValueError):
+        twitter_client.create_twitter_api("DefectBot", fallback=False)
+
+    monkeypatch.setenv("DEFECTBOT_ACCESS_TOKEN", "token")
+    monkeypatch.setenv("DEFECTBOT_ACCESS_TOKEN_SECRET", "secret")
+
+    assert twitter_client.create_twitter_api("DefectBot", fallback=False)
+
+
+def test_process_tweet_speculation():
+    """Test that the precomputed move is played without calling the strategy again"""
+    with TempDirectory() as tempdir:
+        client = make_client(
+            tempdir, dict(DilemmaBot=prisonersdilemma.strategy.play_tit_for_tat)
+        )
+        bot = client.bots["DilemmaBot"]
+
+        client.process_tweet(make_tweet("test_user", "@DilemmaBot play"))
+        assert "speculation" not in bot.active_games["test_user"]
+
+        client.speculate_pending()
+        speculation = bot.active_games["test_user"]["speculation"]
+        assert sorted(speculation) == ["own_move", "round", "signature"]
+
+        # Replace the precomputed move to check that it is played as it is
+        speculation["own_move"] = False
+        bot.strategy = mock.Mock(wraps=bot.strategy)
+        client.process_tweet(make_tweet("test_user", "@DilemmaBot D", 1))
+
+        assert bot.strategy.call_count == 0
+        assert "My move: ❌" in get_replies(client, "DilemmaBot")[-1]
+        assert bot.active_games["test_user"]["moves"] == [[False, False]]
+
+        # The next move is chosen only after the batch of tweets
+        assert "speculation" not in bot.active_games["test_user"]
+        client.speculate_pending()
+        assert bot.strategy.call_count == 1
+
+
+def test_process_tweet_stale_speculation():
+    """Test that moves precomputed by another strategy are not reused"""
+    with TempDirectory() as tempdir:
+        client = make_client(
+            tempdir, dict(DilemmaBot=prisonersdilemma.strategy.play_tit_for_tat)
+        )
+        client.process_tweet(make_tweet("test_user", "@DilemmaBot play"))
+        client.speculate_pending()
+        client.save_active_games()
+
+        client = make_client(
+            tempdir, dict(DilemmaBot=prisonersdilemma.strategy.play_always_defect)
+        )
+        assert "speculation" in client.bots["DilemmaBot"].active_games["test_user"]
+
+        client.process_tweet(make_tweet("test_user", "@DilemmaBot C", 1))
+
+        assert "My move: ❌" in get_replies(client, "DilemmaBot")[-1]
+
+
+def test_first_handle_keeps_games():
+    """Test that adding a handle keeps the games of the first handle"""
+    with TempDirectory() as tempdir:
+        client = make_client(
+            tempdir, dict(DilemmaBot=prisonersdilemma.strategy.play_tit_for_tat)
+        )
+        client.process_tweet(make_tweet("test_user", "@DilemmaBot play"))
+        client.save_active_games()
+
+        client = make_client(
+            tempdir,
+            dict(
+                DilemmaBot=prisonersdilemma.strategy.play_tit_for_tat,
+                DefectBot=prisonersdilemma.strategy.play_always_defect,
+            ),
+        )
+        client.save_active_games()
+
+        assert client.bots["DilemmaBot"].is_user_playing("test_user")
+        assert client.active_games_files["DefectBot"].name == "games_DefectBot.json"
+
+
+def test_client_access_tokens(monkeypatch):
+    """Test that only the first handle of the client can use the default access token"""
+    monkeypatch.setenv("ACCESS_TOKEN", "token")
+    monkeypatch.setenv("ACCESS_TOKEN_SECRET", "secret")
+    for variable in ["DILEMMABOT_ACCESS_TOKEN", "DEFECTBOT_ACCESS_TOKEN"]:
+        monkeypatch.delenv(variable, raising=False)
+        monkeypatch.delenv(variable + "_SECRET", raising=False)
+
+    bots = dict(
+        DilemmaBot=prisonersdilemma.strategy.play_tit_for_tat,
+        DefectBot=prisonersdilemma.strategy.play_always_defect,
+    )
+
+    with TempDirectory() as tempdir:
+        with pytest.raises(ValueError):
+            twitter_client.PrisonersDilemmaTwitterClient(
+                10,
+                tempdir.getpath("state.json"),
+                tempdir.getpath("games.json"),
+                tempdir.getpath("archive.json"),
+                bots=bots,
+            )
+
+        monkeypatch.setenv("DEFECTBOT_ACCESS_TOKEN", "defect_token")
+        monkeypatch.setenv("DEFECTBOT_ACCESS_TOKEN_SECRET", "defect_secret")
+
+        client = twitter_client.PrisonersDilemmaTwitterClient(
+            10,
+            tempdir.getpath("state.json"),
+            tempdir.getpath("games.json"),
+            tempdir.getpath("archive.json"),
+            bots=bots,
+        )
+
+    assert client.reply_apis["DilemmaBot"].auth.access_token == "token"
+    assert client.reply_apis["DefectBot"].auth.access_token == "defect_token"
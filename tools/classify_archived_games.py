@@ -0,0 +1,59 @@
+import argparse
+from collections import Counter
+from prisonersdilemma.classify import classify_archive
+
+
+def parse_args():
+    description = """Read the archived games file and find the classic strategy that each player
+    resembles the most"""
+
+    parser = argparse.ArgumentParser(description=description)
+
+    parser.add_argument(
+        "-a",
+        "--archive",
+        dest="archive_file",
+        action="store",
+        default="archive.json",
+        help="File storing the games that were finished as an archive",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--chunk-size",
+        dest="chunk_size",
+        action="store",
+        type=int,
+        default=10000,
+        help="Number of games classified at once",
+    )
+
+    parser.add_argument(
+        "-s",
+        "--summary",
+        dest="summary",
+        action="store_true",
+        help="Print only the number of players resembling each strategy",
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    # Parse the arguments
+    args = parse_args()
+
+    results = classify_archive(args.archive_file, chunk_size=args.chunk_size)
+
+    if args.summary:
+        # Count the players of each strategy
+        counts = Counter(result["strategy"] for result in results)
+        for strategy, count in counts.most_common():
+            print(f"{strategy}\t\t{count}")
+    else:
+        # Print the number of games and the strategy of each player
+        for result in results:
+            print(
+                f"@{result['user']}\t\t{result['games']}\t{result['strategy']}\t"
+                f"{result['score']:.2f}"
+            )
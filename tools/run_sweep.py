@@ -0,0 +1,79 @@
+import json
+import argparse
+import prisonersdilemma.strategy as strategy
+from prisonersdilemma.sweep import SweepCache, run_sweep, query_results, format_results
+
+
+def parse_args():
+    description = """Play all pairs of strategies with different payoff matrices and game lengths
+    and print the results as a table"""
+
+    parser = argparse.ArgumentParser(description=description)
+
+    parser.add_argument(
+        "-s",
+        "--strategies",
+        dest="strategies",
+        nargs="+",
+        default=["tit_for_tat", "always_cooperate", "always_defect"],
+        help="Names of the strategies to play",
+    )
+
+    parser.add_argument(
+        "-m",
+        "--matrices",
+        dest="game_matrices",
+        nargs="+",
+        default=["5,3,1,0"],
+        help="Payoff matrices to play with, each given as four comma separated payoffs",
+    )
+
+    parser.add_argument(
+        "-n",
+        "--moves",
+        dest="moves_to_play",
+        nargs="+",
+        type=int,
+        default=[10],
+        help="Game lengths to play",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--cache",
+        dest="cache_dir",
+        action="store",
+        default="sweep_cache",
+        help="Directory storing the results of the played matches",
+    )
+
+    parser.add_argument(
+        "-q",
+        "--query",
+        dest="query",
+        action="store",
+        default="{}",
+        help='JSON object with the column values to select, e.g. {"strategy_1": "tit_for_tat"}',
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    # Parse the arguments
+    args = parse_args()
+
+    strategies = [getattr(strategy, "play_" + name) for name in args.strategies]
+    game_matrices = [
+        tuple(int(payoff) for payoff in matrix.split(","))
+        for matrix in args.game_matrices
+    ]
+
+    # Play the missing matches and select the requested results
+    results = run_sweep(
+        strategies, game_matrices, args.moves_to_play, SweepCache(args.cache_dir)
+    )
+    results = query_results(results, **json.loads(args.query))
+
+    # Print the results
+    print(format_results(results))